@@ -1,131 +1,658 @@
+import csv
+import os
+import pwd
+import re
 import subprocess
-from xml.dom.minidom import parseString, Element
-from typing import Dict
+import time
+from functools import lru_cache
+from typing import Dict, List, Tuple, Callable, Union, NamedTuple
+
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
+
+
+class ProcInfo(NamedTuple):
+    """Information about a single GPU compute process"""
+
+    name: str
+    mem: int
+    user: str = ""
+    lifetime: str = ""
+    command: str = ""
+
+
+class GPUProps(NamedTuple):
+    """Properties of a single GPU. processes is a dictionary of
+    ProcInfo keyed by PID."""
+
+    name: str
+    total_mem: int
+    used_mem: int
+    fan: int
+    temp: int
+    max_temp: int
+    used_power: int
+    power_limit: int
+    utilization: int
+    processes: Dict[int, ProcInfo]
 
 
 class GPUQuery(object):
-    """Nvidia-SMI XML query generator and parser"""
+    """Nvidia-SMI CSV query generator and parser"""
+
+    # Properties that rarely or never change at runtime. Drivers that do
+    # not know the trailing T.Limit field reject the whole query, so it is
+    # dropped from later queries if a query with it fails.
+    static_fields = (
+        "index",
+        "uuid",
+        "name",
+        "memory.total",
+        "power.limit",
+        "temperature.gpu",
+        "temperature.gpu.tlimit",
+    )
+    # Properties that change from one poll to the next
+    dynamic_fields = (
+        "index",
+        "memory.used",
+        "fan.speed",
+        "temperature.gpu",
+        "power.draw",
+        "utilization.gpu",
+    )
+    app_fields = ("gpu_uuid", "pid", "process_name", "used_memory")
+
+    __slots__ = ("stream", "stream_rows", "tlimit_supported")
 
     def __init__(self):
-        self.xml_out = None
+        self.stream = None
+        self.stream_rows = 0
+        self.tlimit_supported = True
 
     @staticmethod
-    def _nvsmi_call() -> subprocess.CompletedProcess:
-        """Subprocess call to nvidia-smi specifying XML output
-        of GPU information.
+    def _nvsmi_args(query: str, fields: Tuple[str]) -> List[str]:
+        """Builds the nvidia-smi command line for header-less,
+        unit-less CSV output of the requested fields.
+
+        Parameters
+        ----------
+        query:
+            nvidia-smi query option, eg "query-gpu" or "query-compute-apps"
+        fields:
+            Tuple of nvidia-smi field names to query
+
+        Returns
+        -------
+        args:
+            nvidia-smi command and arguments
+        """
+        return [
+            "nvidia-smi",
+            "--{}={}".format(query, ",".join(fields)),
+            "--format=csv,noheader,nounits",
+        ]
+
+    @staticmethod
+    def _nvsmi_call(query: str, fields: Tuple[str]) -> subprocess.CompletedProcess:
+        """Subprocess call to nvidia-smi specifying header-less,
+        unit-less CSV output of the requested fields.
+
+        Parameters
+        ----------
+        query:
+            nvidia-smi query option, eg "query-gpu" or "query-compute-apps"
+        fields:
+            Tuple of nvidia-smi field names to query
 
         Returns
         -------
         completed_process:
-            CompletedProcess instance containing the XML output of nvidia-smi
+            CompletedProcess instance containing the CSV output of nvidia-smi
         """
         completed_process = subprocess.run(
-            ["nvidia-smi", "-q", "-x"], capture_output=True
+            GPUQuery._nvsmi_args(query, fields), capture_output=True, text=True
         )
         return completed_process
 
     @staticmethod
-    def parse_gpu_props(gpu: Element) -> Dict:
-        """Method for parsing nvidia-smi XML output
+    def _read_csv(text: str) -> List[List[str]]:
+        """Splits nvidia-smi CSV output into rows of fields
 
         Parameters
         ----------
-        gpu:
-            An XML minidom Element instance that represents
-            a "GPU" node in the xml minidom tree
+        text:
+            CSV output of nvidia-smi
 
         Returns
         -------
-        gpu_props:
-            dictionary of the gpu properties
+        rows:
+            List of non-empty rows, each a list of field strings
         """
-        gpu_props = {}
+        return [
+            row for row in csv.reader(text.splitlines(), skipinitialspace=True) if row
+        ]
 
-        gpu_props["name"] = (
-            gpu.getElementsByTagName("product_name")[0].childNodes[0].data
-        )
-        gpu_props["total_mem"] = int(
-            gpu.getElementsByTagName("fb_memory_usage")[0]
-            .childNodes[1]
-            .childNodes[0]
-            .data.split(" ")[0]
-        )
-        gpu_props["used_mem"] = int(
-            gpu.getElementsByTagName("fb_memory_usage")[0]
-            .childNodes[3]
-            .childNodes[0]
-            .data.split(" ")[0]
+    @staticmethod
+    def _field_rows(
+        completed_process: subprocess.CompletedProcess, fields: Tuple[str]
+    ) -> List[List[str]]:
+        """Extracts the rows of the requested fields from a one-shot
+        nvidia-smi call. Raises a RuntimeError carrying the nvidia-smi
+        message if the call failed, or if it printed output of which no
+        row has the requested fields (eg, "No devices were found").
+
+        Parameters
+        ----------
+        completed_process:
+            CompletedProcess instance of the nvidia-smi call
+        fields:
+            Tuple of the nvidia-smi field names that were queried
+
+        Returns
+        -------
+        rows:
+            List of CSV rows with one entry per requested field
+        """
+        output = completed_process.stdout
+        rows = [row for row in GPUQuery._read_csv(output) if len(row) == len(fields)]
+        if completed_process.returncode != 0 or (len(rows) == 0 and output.strip()):
+            message = (output + completed_process.stderr).strip()
+            raise RuntimeError(
+                "nvidia-smi failed with exit status {}: {}".format(
+                    completed_process.returncode, message
+                )
+            )
+        return rows
+
+    @staticmethod
+    def _to_number(field: str, cast: Callable = float) -> Union[int, float]:
+        """Converts a unit-less nvidia-smi field to a number. Unavailable
+        readings (eg, "[N/A]" or "[Not Supported]") are reported as zero.
+
+        Parameters
+        ----------
+        field:
+            nvidia-smi CSV field
+        cast:
+            Numeric type of the returned value
+
+        Returns
+        -------
+        value:
+            numeric value of the field
+        """
+        try:
+            return cast(float(field))
+        except ValueError:
+            return cast(0)
+
+    @staticmethod
+    def parse_static_props(row: List[str]) -> Dict:
+        """Method for parsing the static GPU properties from nvidia-smi CSV output
+
+        Parameters
+        ----------
+        row:
+            A single "--query-gpu" CSV row, ordered as GPUQuery.static_fields,
+            possibly without the trailing T.Limit field
+
+        Returns
+        -------
+        static_props:
+            dictionary of the name, total_mem, max_temp and power_limit properties
+        """
+        to_number = GPUQuery._to_number
+        static_props = {}
+
+        static_props["name"] = row[2]
+        static_props["total_mem"] = to_number(row[3], int)
+        static_props["power_limit"] = to_number(row[4], int)
+        # T.Limit is the margin to the slowdown temperature. If either is
+        # unavailable, so is the threshold, which is reported as zero.
+        static_props["max_temp"] = 0
+        if len(row) == len(GPUQuery.static_fields):
+            try:
+                static_props["max_temp"] = int(float(row[5])) + int(float(row[6]))
+            except ValueError:
+                pass
+
+        return static_props
+
+    @staticmethod
+    def parse_dynamic_props(row: List[str]) -> Dict:
+        """Method for parsing the dynamic GPU properties from nvidia-smi CSV output
+
+        Parameters
+        ----------
+        row:
+            A single "--query-gpu" CSV row, ordered as GPUQuery.dynamic_fields
+
+        Returns
+        -------
+        dynamic_props:
+            dictionary of the used_mem, fan, temp, used_power and
+            utilization properties
+        """
+        to_number = GPUQuery._to_number
+        dynamic_props = {}
+
+        dynamic_props["used_mem"] = to_number(row[1], int)
+        dynamic_props["fan"] = to_number(row[2], int)
+        dynamic_props["temp"] = to_number(row[3], int)
+        dynamic_props["used_power"] = to_number(row[4], int)
+        dynamic_props["utilization"] = to_number(row[5], int)
+
+        return dynamic_props
+
+    @staticmethod
+    def parse_processes(app_rows: List[List[str]]) -> Dict[int, ProcInfo]:
+        """Method for parsing compute processes from nvidia-smi CSV output
+
+        Parameters
+        ----------
+        app_rows:
+            "--query-compute-apps" CSV rows, ordered as GPUQuery.app_fields,
+            of the processes running on a single GPU
+
+        Returns
+        -------
+        processes:
+            dictionary of ProcInfo, keyed by PID
+        """
+        to_number = GPUQuery._to_number
+        return {
+            int(app_row[1]): ProcInfo(
+                name=app_row[2].split("/")[-1], mem=to_number(app_row[3], int)
+            )
+            for app_row in app_rows
+        }
+
+    def open_stream(self, polling_rate: float, num_gpus: int):
+        """Starts a persistent nvidia-smi process that emits one dynamic
+        properties "--query-gpu" CSV row per GPU every polling_rate seconds,
+        avoiding a process spawn and driver initialization per poll.
+
+        Parameters
+        ----------
+        polling_rate:
+            Number of seconds between samples
+        num_gpus:
+            Number of CSV rows that make up a single sample
+        """
+        self.stream = subprocess.Popen(
+            GPUQuery._nvsmi_args("query-gpu", GPUQuery.dynamic_fields)
+            + ["-lms", "{}".format(int(polling_rate * 1000))],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
         )
+        self.stream_rows = num_gpus
+
+    def _read_stream(self) -> Union[List[List[str]], None]:
+        """Blocks until the next full sample is available from the
+        persistent nvidia-smi process.
 
-        gpu_props["fan"] = int(
-            gpu.getElementsByTagName("fan_speed")[0].childNodes[0].data.split(" ")[0]
+        Returns
+        -------
+        gpu_rows:
+            List of dynamic properties CSV rows, or None if the persistent
+            process has exited (eg, because looping is unsupported or it
+            was interrupted), was closed or yields samples of no rows
+        """
+        stream = self.stream
+        # With no rows to read, every "sample" would return at once
+        if stream is None or self.stream_rows == 0:
+            return None
+        lines = []
+        while len(lines) < self.stream_rows:
+            line = stream.stdout.readline()
+            if not line:
+                self.close()
+                return None
+            # Skip blank separator lines
+            if not line.isspace():
+                lines.append(line)
+        # The whole sample is parsed in a single pass
+        gpu_rows = [
+            row
+            for row in csv.reader(lines, skipinitialspace=True)
+            if len(row) == len(GPUQuery.dynamic_fields)
+        ]
+        return gpu_rows
+
+    def interrupt_stream(self):
+        """Terminates the persistent nvidia-smi process, if any, so that a
+        read blocked on it in another thread returns. The stream itself is
+        released by the reading thread, or by GPUQuery.close()."""
+        stream = self.stream
+        if stream is not None:
+            stream.terminate()
+
+    def close(self):
+        """Terminates the persistent nvidia-smi process, if any"""
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            stream.terminate()
+            stream.wait()
+            stream.stdout.close()
+
+    def poll_slow(self) -> Tuple[Dict[int, Dict], Dict[int, Dict[int, ProcInfo]]]:
+        """Method querying and parsing the static GPU properties and compute
+        processes from one-shot nvidia-smi calls. The two calls run
+        concurrently. Processes are mapped to their GPU by UUID.
+
+        Returns
+        -------
+        all_static_props:
+            dictionary of static gpu properties, keyed by GPU index
+        all_processes:
+            dictionary of compute processes, keyed by GPU index
+        """
+        # Started first so that it overlaps with the GPU query
+        app_process = subprocess.Popen(
+            GPUQuery._nvsmi_args("query-compute-apps", GPUQuery.app_fields),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
         )
+        fields = GPUQuery.static_fields
+        if not self.tlimit_supported:
+            fields = fields[:-1]
+        gpu_process = GPUQuery._nvsmi_call("query-gpu", fields)
+        if gpu_process.returncode != 0 and self.tlimit_supported:
+            # Retry without T.Limit, in case this driver does not know it
+            fields = fields[:-1]
+            gpu_process = GPUQuery._nvsmi_call("query-gpu", fields)
+            if gpu_process.returncode == 0:
+                self.tlimit_supported = False
+        app_output = app_process.communicate()[0]
+        gpu_rows = GPUQuery._field_rows(gpu_process, fields)
+        app_rows = GPUQuery._read_csv(app_output)
+        apps_by_uuid = {row[1]: [] for row in gpu_rows}
+        for app_row in app_rows:
+            if len(app_row) == len(GPUQuery.app_fields) and app_row[0] in apps_by_uuid:
+                apps_by_uuid[app_row[0]].append(app_row)
+        all_static_props = {
+            int(row[0]): GPUQuery.parse_static_props(row) for row in gpu_rows
+        }
+        all_processes = {
+            int(row[0]): GPUQuery.parse_processes(apps_by_uuid[row[1]])
+            for row in gpu_rows
+        }
+        return all_static_props, all_processes
+
+    def poll_fast(self) -> Dict[int, Dict]:
+        """Method querying and parsing the dynamic GPU properties from
+        nvidia-smi. They are read from the persistent nvidia-smi process
+        if one is open, otherwise from a one-shot call.
+
+        Returns
+        -------
+        all_dynamic_props:
+            dictionary of dynamic gpu properties, keyed by GPU index
+        """
+        gpu_rows = self._read_stream() if self.stream is not None else None
+        if gpu_rows is None:
+            gpu_rows = GPUQuery._field_rows(
+                GPUQuery._nvsmi_call("query-gpu", GPUQuery.dynamic_fields),
+                GPUQuery.dynamic_fields,
+            )
+        return {int(row[0]): GPUQuery.parse_dynamic_props(row) for row in gpu_rows}
+
+    @staticmethod
+    def versions() -> Tuple[str, str]:
+        """Method for reading the CUDA and driver versions from
+        the nvidia-smi summary header
+
+        Returns
+        -------
+        cuda_version:
+            CUDA version supported by the driver
+        driver_version:
+            Nvidia driver version
+        """
+        header = subprocess.run(["nvidia-smi"], capture_output=True, text=True).stdout
+        cuda_match = re.search(r"CUDA Version:\s*(\S+)", header)
+        driver_match = re.search(r"Driver Version:\s*(\S+)", header)
+        cuda_version = cuda_match.group(1) if cuda_match else "N/A"
+        driver_version = driver_match.group(1) if driver_match else "N/A"
+        return cuda_version, driver_version
+
+
+class NVMLQuery(object):
+    """In-process GPU query using the NVML bindings provided by pynvml.
+    Produces the same GPU properties as GPUQuery without spawning
+    nvidia-smi.
+
+    Raises
+    ------
+    ImportError:
+        If pynvml is not installed
+    pynvml.NVMLError:
+        If NVML cannot be initialized (eg, no Nvidia driver)
+    """
+
+    __slots__ = ("stream", "handles")
 
-        gpu_props["temp"] = float(
-            gpu.getElementsByTagName("temperature")[0]
-            .childNodes[1]
-            .childNodes[0]
-            .data.split(" ")[0]
+    def __init__(self):
+        if pynvml is None:
+            raise ImportError("NVMLQuery requires pynvml (nvidia-ml-py)")
+        pynvml.nvmlInit()
+        self.stream = None
+        try:
+            self.handles = [
+                pynvml.nvmlDeviceGetHandleByIndex(i)
+                for i in range(pynvml.nvmlDeviceGetCount())
+            ]
+        except pynvml.NVMLError:
+            # The caller may fall back to another query, so release NVML
+            pynvml.nvmlShutdown()
+            raise
+
+    @staticmethod
+    def _to_str(value: Union[str, bytes]) -> str:
+        """Decodes NVML strings, which older pynvml versions return as bytes"""
+        if isinstance(value, bytes):
+            return value.decode()
+        return value
+
+    @staticmethod
+    def _read(func: Callable, *args, default=0):
+        """Calls an NVML function, reporting readings that are unsupported
+        or unavailable on this device as default.
+
+        Parameters
+        ----------
+        func:
+            NVML query function
+        args:
+            Arguments passed to func
+        default:
+            Value returned if the NVML call fails
+
+        Returns
+        -------
+        value:
+            Result of the NVML call, or default
+        """
+        try:
+            return func(*args)
+        except pynvml.NVMLError:
+            return default
+
+    @staticmethod
+    def parse_static_props(handle) -> Dict:
+        """Method for reading the static GPU properties through NVML
+
+        Parameters
+        ----------
+        handle:
+            NVML device handle
+
+        Returns
+        -------
+        static_props:
+            dictionary of the name, total_mem, max_temp and power_limit properties
+        """
+        read = NVMLQuery._read
+        static_props = {}
+
+        static_props["name"] = NVMLQuery._to_str(
+            read(pynvml.nvmlDeviceGetName, handle, default="")
+        )
+        memory = read(pynvml.nvmlDeviceGetMemoryInfo, handle, default=None)
+        static_props["total_mem"] = memory.total // 1024**2 if memory is not None else 0
+        static_props["max_temp"] = read(
+            pynvml.nvmlDeviceGetTemperatureThreshold,
+            handle,
+            pynvml.NVML_TEMPERATURE_THRESHOLD_SLOWDOWN,
         )
-        gpu_props["max_temp"] = float(
-            gpu.getElementsByTagName("temperature")[0]
-            .childNodes[3]
-            .childNodes[0]
-            .data.split(" ")[0]
+        static_props["power_limit"] = (
+            read(pynvml.nvmlDeviceGetEnforcedPowerLimit, handle) // 1000
         )
 
-        gpu_props["used_power"] = float(
-            gpu.getElementsByTagName("power_readings")[0]
-            .childNodes[5]
-            .childNodes[0]
-            .data.split(" ")[0]
+        return static_props
+
+    @staticmethod
+    def parse_dynamic_props(handle) -> Dict:
+        """Method for reading the dynamic GPU properties through NVML
+
+        Parameters
+        ----------
+        handle:
+            NVML device handle
+
+        Returns
+        -------
+        dynamic_props:
+            dictionary of the used_mem, fan, temp, used_power and
+            utilization properties
+        """
+        read = NVMLQuery._read
+        dynamic_props = {}
+
+        memory = read(pynvml.nvmlDeviceGetMemoryInfo, handle, default=None)
+        dynamic_props["used_mem"] = memory.used // 1024**2 if memory is not None else 0
+        dynamic_props["fan"] = read(pynvml.nvmlDeviceGetFanSpeed, handle)
+        dynamic_props["temp"] = read(
+            pynvml.nvmlDeviceGetTemperature, handle, pynvml.NVML_TEMPERATURE_GPU
         )
-        gpu_props["power_limit"] = float(
-            gpu.getElementsByTagName("power_readings")[0]
-            .childNodes[7]
-            .childNodes[0]
-            .data.split(" ")[0]
+        dynamic_props["used_power"] = (
+            read(pynvml.nvmlDeviceGetPowerUsage, handle) // 1000
         )
+        utilization = read(pynvml.nvmlDeviceGetUtilizationRates, handle, default=None)
+        dynamic_props["utilization"] = utilization.gpu if utilization is not None else 0
 
-        gpu_props["utilization"] = int(
-            gpu.getElementsByTagName("utilization")[0]
-            .childNodes[1]
-            .childNodes[0]
-            .data.split(" ")[0]
-        )
+        return dynamic_props
 
-        process_nodelist = gpu.getElementsByTagName("process_info")
+    @staticmethod
+    def parse_processes(handle) -> Dict[int, ProcInfo]:
+        """Method for reading the compute processes of a GPU through NVML
+
+        Parameters
+        ----------
+        handle:
+            NVML device handle
+
+        Returns
+        -------
+        processes:
+            dictionary of ProcInfo, keyed by PID
+        """
+        read = NVMLQuery._read
         processes = {}
-        for node in process_nodelist:
-            pid = int(node.childNodes[5].childNodes[0].data)
-            pname = node.childNodes[9].childNodes[0].data.split("/")[-1]
-            mem = int(node.childNodes[11].childNodes[0].data.split(" ")[0])
-            completed_process = subprocess.run(
-                ["ps", "--no-headers", "-p", "{}".format(pid), "-o", "user,comm,etime"],
-                capture_output=True,
-                text=True,
+        for proc in read(
+            pynvml.nvmlDeviceGetComputeRunningProcesses, handle, default=[]
+        ):
+            pname = read(pynvml.nvmlSystemGetProcessName, proc.pid, default="")
+            processes[proc.pid] = ProcInfo(
+                name=NVMLQuery._to_str(pname).split("/")[-1],
+                mem=(proc.usedGpuMemory or 0) // 1024**2,
             )
+        return processes
 
-            # Handle improper/incomplete output
-            if len(completed_process.stdout.split()) == 3:
-                user, comm, lifetime = completed_process.stdout.split()
-            else:
-                user, comm, lifetime = "", "", ""
-            processes[pid] = {}
-            processes[pid]["name"] = pname
-            processes[pid]["mem"] = mem
-            processes[pid]["user"] = user
-            processes[pid]["lifetime"] = lifetime
-            processes[pid]["command"] = comm
+    def poll_slow(self) -> Tuple[Dict[int, Dict], Dict[int, Dict[int, ProcInfo]]]:
+        """Method querying the static GPU properties and compute processes
+        from NVML
 
-        gpu_props["processes"] = processes
+        Returns
+        -------
+        all_static_props:
+            dictionary of static gpu properties, keyed by GPU index
+        all_processes:
+            dictionary of compute processes, keyed by GPU index
+        """
+        all_static_props = {
+            i: NVMLQuery.parse_static_props(handle)
+            for i, handle in enumerate(self.handles)
+        }
+        all_processes = {
+            i: NVMLQuery.parse_processes(handle)
+            for i, handle in enumerate(self.handles)
+        }
+        return all_static_props, all_processes
 
-        return gpu_props
+    def poll_fast(self) -> Dict[int, Dict]:
+        """Method querying the dynamic GPU properties from NVML
 
-    def make_query(self):
-        """Method parsing and storing minidom-parsed XML
-        from nvidia-smi"""
-        self.xml_out = parseString(GPUQuery._nvsmi_call().stdout)
+        Returns
+        -------
+        all_dynamic_props:
+            dictionary of dynamic gpu properties, keyed by GPU index
+        """
+        return {
+            i: NVMLQuery.parse_dynamic_props(handle)
+            for i, handle in enumerate(self.handles)
+        }
+
+    @staticmethod
+    def versions() -> Tuple[str, str]:
+        """Method for reading the CUDA and driver versions from NVML
+
+        Returns
+        -------
+        cuda_version:
+            CUDA version supported by the driver
+        driver_version:
+            Nvidia driver version
+        """
+        cuda = pynvml.nvmlSystemGetCudaDriverVersion()
+        cuda_version = "{}.{}".format(cuda // 1000, (cuda % 1000) // 10)
+        driver_version = NVMLQuery._to_str(pynvml.nvmlSystemGetDriverVersion())
+        return cuda_version, driver_version
+
+    def open_stream(self, polling_rate: float, num_gpus: int):
+        """NVML is queried in-process, so there is no stream to open"""
+        pass
+
+    def interrupt_stream(self):
+        """NVML is queried in-process, so there is no stream to interrupt"""
+        pass
+
+    def close(self):
+        """Shuts down NVML"""
+        pynvml.nvmlShutdown()
+
+
+def default_query() -> Union[NVMLQuery, GPUQuery]:
+    """Returns an NVMLQuery if pynvml is installed and NVML can be
+    initialized, otherwise falls back to the nvidia-smi based GPUQuery.
+
+    Returns
+    -------
+    query:
+        GPU query instance
+    """
+    if pynvml is not None:
+        try:
+            return NVMLQuery()
+        except pynvml.NVMLError:
+            pass
+    return GPUQuery()
 
 
 class Tracker(object):
@@ -134,35 +661,234 @@ class Tracker(object):
     Parameters
     ----------
     query:
-        GPUquery instance
+        GPUQuery or NVMLQuery instance. If None, NVML is used when
+        available and nvidia-smi otherwise, see default_query().
     polling_rate:
-        The rate at which queries about GPU information should be made
+        The rate, in seconds, at which the dynamic GPU properties (memory
+        usage, fan, temperature, power draw and utilization) are queried
+    stream:
+        If True, GPU information is streamed from a persistent
+        nvidia-smi process rather than queried once per poll
+    slow_polling_rate:
+        The rate, in seconds, at which the static GPU properties (name,
+        total memory, temperature threshold and power limit) and the
+        compute process table are refreshed. These change much more
+        slowly than the dynamic properties.
     """
 
-    def __init__(self, query: GPUQuery, polling_rate: int = 1):
-        self.query = query
+    # Seconds before cached process user/command/start time are re-read
+    proc_cache_ttl = 60.0
+
+    __slots__ = (
+        "query",
+        "polling_rate",
+        "slow_polling_rate",
+        "props_buffer",
+        "static_props",
+        "filename",
+        "num_gpus",
+        "cuda_version",
+        "driver_version",
+        "_next_slow_poll",
+        "_proc_table",
+        "_proc_cache",
+    )
+
+    def __init__(
+        self,
+        query: Union[GPUQuery, NVMLQuery, None] = None,
+        polling_rate: float = 1,
+        stream: bool = True,
+        slow_polling_rate: float = 5,
+    ):
+        self.query = query if query is not None else default_query()
         self.polling_rate = polling_rate
+        self.slow_polling_rate = slow_polling_rate
         self.props_buffer = None
+        self.static_props = {}
         self.filename = None
+        self._next_slow_poll = 0.0
+        self._proc_table = {}
+        self._proc_cache = {}
         self.poll()
         self.num_gpus = len(self.props_buffer.keys())
-        self.cuda_version = (
-            self.query.xml_out.getElementsByTagName("cuda_version")[0]
-            .childNodes[0]
-            .data
-        )
-        self.driver_version = (
-            self.query.xml_out.getElementsByTagName("driver_version")[0]
-            .childNodes[0]
-            .data
-        )
+        self.cuda_version, self.driver_version = self.query.versions()
+        # Without GPUs there are no samples to pace the polls
+        if stream and self.num_gpus > 0:
+            self.query.open_stream(self.polling_rate, self.num_gpus)
+
+    @property
+    def streaming(self) -> bool:
+        """True if polls are paced by a persistent nvidia-smi process"""
+        return self.query.stream is not None
 
     def poll(self):
-        """Method that makes a query, parses the xml, and stores the
+        """Method that makes a query, parses the output, and stores the
         parsed dictionary in a volatile buffer attribute, Tracker.props_buffer.
         Each call to poll() overwrites this buffer with the newest parsed output.
+        The new dictionary is fully built before being published with a single
+        assignment, and is never mutated afterwards, so readers holding a
+        reference to Tracker.props_buffer always see a consistent snapshot.
+
+        Only the dynamic GPU properties are queried on every poll. The static
+        properties, Tracker.static_props, and the compute process table are
+        refreshed once Tracker.slow_polling_rate seconds have passed; in
+        between, the last process table is reused with updated lifetimes.
         """
-        self.query.make_query()
-        gpus = self.query.xml_out.getElementsByTagName("gpu")
-        all_gpu_props = {i: GPUQuery.parse_gpu_props(gpu) for i, gpu in enumerate(gpus)}
+        if time.monotonic() >= self._next_slow_poll:
+            self.static_props, self._proc_table = self.query.poll_slow()
+            self._update_proc_cache(
+                [pid for procs in self._proc_table.values() for pid in procs]
+            )
+            self._next_slow_poll = time.monotonic() + self.slow_polling_rate
+        all_dynamic_props = self.query.poll_fast()
+
+        now = time.time()
+        all_gpu_props = {}
+        for gpu_id, dynamic_props in all_dynamic_props.items():
+            # Skip GPUs that appeared since the last slow refresh
+            if gpu_id not in self.static_props:
+                continue
+            processes = {}
+            for pid, process in self._proc_table.get(gpu_id, {}).items():
+                user, comm, start_time, _ = self._proc_cache.get(
+                    pid, ("", "", None, None)
+                )
+                processes[pid] = process._replace(
+                    user=user,
+                    lifetime=(
+                        Tracker._format_lifetime(now - start_time)
+                        if start_time is not None
+                        else ""
+                    ),
+                    command=comm,
+                )
+            all_gpu_props[gpu_id] = GPUProps(
+                processes=processes, **self.static_props[gpu_id], **dynamic_props
+            )
         self.props_buffer = all_gpu_props
+
+    def _update_proc_cache(self, pids: List[int]):
+        """Updates the cache of process user, command and start time.
+        Entries of processes that are no longer running on a GPU are
+        dropped, and only unknown or expired PIDs are looked up.
+
+        Parameters
+        ----------
+        pids:
+            Process IDs currently running on the GPUs
+        """
+        now = time.time()
+        pids = set(pids)
+        self._proc_cache = {
+            pid: entry for pid, entry in self._proc_cache.items() if pid in pids
+        }
+        stale_pids = [
+            pid
+            for pid in pids
+            if pid not in self._proc_cache or self._proc_cache[pid][3] < now
+        ]
+        proc_info = Tracker._snapshot_procs(stale_pids)
+        for pid, (user, comm, start_time) in proc_info.items():
+            self._proc_cache[pid] = (
+                user,
+                comm,
+                start_time,
+                now + Tracker.proc_cache_ttl,
+            )
+
+    @staticmethod
+    def _format_lifetime(seconds: float) -> str:
+        """Formats elapsed seconds in the style of ps etime, [[dd-]hh:]mm:ss
+
+        Parameters
+        ----------
+        seconds:
+            Elapsed time in seconds
+
+        Returns
+        -------
+        lifetime:
+            Formatted elapsed time
+        """
+        minutes, seconds = divmod(max(0, int(seconds)), 60)
+        hours, minutes = divmod(minutes, 60)
+        days, hours = divmod(hours, 24)
+        if days > 0:
+            return "{}-{:02d}:{:02d}:{:02d}".format(days, hours, minutes, seconds)
+        if hours > 0:
+            return "{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds)
+        return "{:02d}:{:02d}".format(minutes, seconds)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _username(uid: int) -> str:
+        """Looks up the name of a user, caching the result since GPU
+        processes tend to belong to a handful of users.
+
+        Parameters
+        ----------
+        uid:
+            User ID
+
+        Returns
+        -------
+        username:
+            User name, or the user ID if it has no passwd entry
+        """
+        try:
+            return pwd.getpwuid(uid).pw_name
+        except KeyError:
+            return "{}".format(uid)
+
+    @staticmethod
+    def _snapshot_procs(pids: List[int]) -> Dict[int, Tuple[str, str, float]]:
+        """Reads the user, command and start time of every requested
+        process directly from /proc, without spawning any subprocess.
+
+        Parameters
+        ----------
+        pids:
+            List of process IDs
+
+        Returns
+        -------
+        proc_info:
+            dictionary of (user, command, start time) tuples, keyed by PID.
+            Start times are in seconds since the epoch. Processes that
+            could not be read (eg, exited or in another PID namespace)
+            are omitted.
+        """
+        proc_info = {}
+        if len(pids) == 0:
+            return proc_info
+        with open("/proc/uptime") as uptime_file:
+            boot_time = time.time() - float(uptime_file.read().split()[0])
+        clock_ticks = os.sysconf("SC_CLK_TCK")
+        for pid in pids:
+            try:
+                with open("/proc/{}/stat".format(pid)) as stat_file:
+                    stat = stat_file.read()
+                uid = os.stat("/proc/{}".format(pid)).st_uid
+            except OSError:
+                continue
+            # The command is parenthesized and may itself contain spaces
+            # or parentheses; starttime is the 22nd field overall.
+            comm = stat[stat.index("(") + 1 : stat.rindex(")")]
+            start_ticks = int(stat[stat.rindex(")") + 2 :].split()[19])
+            proc_info[pid] = (
+                Tracker._username(uid),
+                comm,
+                boot_time + start_ticks / clock_ticks,
+            )
+        return proc_info
+
+    def interrupt_stream(self):
+        """Method that unblocks a poll waiting on the persistent
+        nvidia-smi process, if any. The waiting poll falls back to a
+        one-shot query."""
+        self.query.interrupt_stream()
+
+    def close(self):
+        """Method that releases any persistent query resources"""
+        self.query.close()
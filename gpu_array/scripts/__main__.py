@@ -1,24 +1,84 @@
 #! /usr/bin/env python
 
 import argparse
+import os
 import subprocess
 from gpu_array.query import *
 from gpu_array.tui import *
 
+# Accepted range of the polling interval, in milliseconds
+poll_ms_range = (100, 10000)
+
+
+def check_poll_ms(poll_ms: int) -> int:
+    """Checks that a polling interval lies within poll_ms_range
+
+    Parameters
+    ----------
+    poll_ms:
+        Polling interval in milliseconds
+
+    Returns
+    -------
+    poll_ms:
+        The unchanged polling interval
+    """
+    if not poll_ms_range[0] <= poll_ms <= poll_ms_range[1]:
+        raise argparse.ArgumentTypeError(
+            "must be between {} and {} ms, got {}".format(*poll_ms_range, poll_ms)
+        )
+    return poll_ms
+
+
+def parse_poll_ms(value: str) -> int:
+    """argparse type of --poll-ms
+
+    Parameters
+    ----------
+    value:
+        Polling interval in milliseconds, as passed on the command line
+
+    Returns
+    -------
+    poll_ms:
+        Polling interval in milliseconds
+    """
+    try:
+        poll_ms = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid int value: '{}'".format(value))
+    return check_poll_ms(poll_ms)
+
 
 def parse_cli():
     parser = argparse.ArgumentParser(description="Tool for visual GPU monitoring")
     parser.add_argument(
         "--cardwidth", type=int, default=35, help="Width of each visual GPU card"
     )
+    parser.add_argument(
+        "--poll-ms",
+        type=parse_poll_ms,
+        default=None,
+        help="Milliseconds between GPU utilization, memory, temperature, power "
+        "and fan updates, from 100 to 10000. Defaults to "
+        "$GPU_POLL_INTERVAL_SECONDS or 1 second.",
+    )
     return parser
 
 
 def main():
     parser = parse_cli()
     cli_args = parser.parse_args()
-    query = GPUQuery()
-    tracker = Tracker(query)
+    poll_ms = cli_args.poll_ms
+    if poll_ms is None:
+        interval = os.environ.get("GPU_POLL_INTERVAL_SECONDS", "1")
+        try:
+            poll_ms = check_poll_ms(int(1000 * float(interval)))
+        except (ValueError, OverflowError, argparse.ArgumentTypeError) as error:
+            parser.error(
+                "invalid GPU_POLL_INTERVAL_SECONDS '{}': {}".format(interval, error)
+            )
+    tracker = Tracker(polling_rate=poll_ms / 1000)
     front = FrontEnd(tracker, card_width=cli_args.cardwidth)
     front.start()
 
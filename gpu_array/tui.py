@@ -1,8 +1,31 @@
+import os
 import urwid
-from .query import GPUQuery, Tracker
-from time import sleep
+from .query import GPUProps, GPUQuery, Tracker
 from threading import Thread, Event
-from typing import Union, List
+from typing import Dict, Union, NamedTuple, Tuple
+
+
+class GaugeCard(NamedTuple):
+    """References to the widgets of a gauge card that are
+    updated on every draw"""
+
+    name_text: urwid.Text
+    mem_text: urwid.Text
+    mem_bar: urwid.ProgressBar
+    fan_text: urwid.Text
+    fan_bar: urwid.ProgressBar
+    temp_text: urwid.Text
+    temp_bar: urwid.ProgressBar
+    power_text: urwid.Text
+    power_bar: urwid.ProgressBar
+
+
+class ProcCard(NamedTuple):
+    """References to the widgets of a process card that are
+    updated on every draw"""
+
+    name_text: urwid.Text
+    proc_text: urwid.Text
 
 
 class PollThread(Thread):
@@ -13,18 +36,28 @@ class PollThread(Thread):
     tracker:
         Tracker instance for requesting, parsing and storing
         GPU information.
+    notify_fd:
+        If not None, a byte is written to this file descriptor
+        after every completed poll
     """
 
-    def __init__(self, tracker: Tracker):
+    def __init__(self, tracker: Tracker, notify_fd: Union[int, None] = None):
         Thread.__init__(self)
         self.stop_event = Event()
         self.tracker = tracker
+        self.notify_fd = notify_fd
 
     def run(self):
-        """Main thread polling loop. Sleeps 1s after each poll."""
-        while not self.stop_event.isSet():
+        """Main thread polling loop. Waits for the polling rate after
+        each poll, unless the tracker is streaming, in which case polls
+        block until the next sample arrives. The wait is cut short if
+        the thread is asked to stop."""
+        while not self.stop_event.is_set():
             self.tracker.poll()
-            sleep(self.tracker.polling_rate)
+            if self.notify_fd is not None:
+                os.write(self.notify_fd, b"\n")
+            if not self.tracker.streaming:
+                self.stop_event.wait(self.tracker.polling_rate)
 
     def join(self, timeout: Union[int, None] = None):
         """Safely request thread to end
@@ -35,13 +68,17 @@ class PollThread(Thread):
             Number of seconds to wait before thread join attempt ends.
         """
         self.stop_event.set()
+        # A streaming poll blocks on nvidia-smi output, not on the event
+        self.tracker.interrupt_stream()
         Thread.join(self, timeout=timeout)
 
 
 class FrontEnd(object):
     """TUI for GPU information. Uses an additional thread to run
-    polling requests from the GPU tracker. During the main loop,
-    "q" quits and "p" toggles GPU statistics and process information.
+    polling requests from the GPU tracker. The cards are redrawn
+    whenever the thread signals a completed poll through a pipe
+    watched by the main loop. During the main loop, "q" quits and
+    "p" toggles GPU statistics and process information.
 
     Parameters
     ----------
@@ -62,6 +99,15 @@ class FrontEnd(object):
     }
     process_labels = {"pid": "PID  ", "memory": "Mem  ", "name": "Name "}
 
+    # Label-prefixed templates for the overwatch card strings
+    _mem_fmt = overwatch_labels["memory"] + "%d/%d MiB"
+    _fan_fmt = overwatch_labels["fan"] + "%d %%"
+    _temp_fmt = overwatch_labels["temperature"] + "%d/%d C"
+    _power_fmt = overwatch_labels["power"] + "%d/%d W"
+
+    # Palette key for each percentage: 0-32 low, 33-65 medium, 66-100 high
+    _color_lut = ("low",) * 33 + ("medium",) * 33 + ("high",) * 35
+
     palette = [
         ("low", "dark green", ""),
         ("medium", "brown", ""),
@@ -72,37 +118,45 @@ class FrontEnd(object):
         ("driver", "light gray", "dark magenta"),
     ]
 
-    def __init__(self, tracker, card_width: int=35):
+    def __init__(self, tracker, card_width: int = 35):
         self.card_width = card_width
         self.current_view = "overwatch"
         self.top = None
+        self.card_refs = None
         self.tracker = tracker
+        self._last_strings = {}
+        self._last_displayed = None
         self._initialize_grid()
         self.loop = urwid.MainLoop(
             self.top, palette=FrontEnd.palette, unhandled_input=self.keypress
         )
-        self.loop.set_alarm_in(sec=1, callback=self._draw)
+        self._poll_fd = self.loop.watch_pipe(self._on_poll)
 
     def _switch_view(self):
         """Swaps current card view after detecting 'p' keypress"""
         if self.current_view == "overwatch":
             self.current_view = "process"
             self._initialize_grid()
+            self._draw()
             return None
         if self.current_view == "process":
             self.current_view = "overwatch"
             self._initialize_grid()
+            self._draw()
             return None
 
     def start(self):
         """Creates and starts the polling thread as well as the TUI main loop"""
-        self.poll_thread = PollThread(self.tracker)
+        self.poll_thread = PollThread(self.tracker, notify_fd=self._poll_fd)
         self.poll_thread.start()
         self.loop.run()
 
     def stop(self):
-        """Joins the polling thread and exits the TUI main loop"""
+        """Joins the polling thread, closes the tracker and exits
+        the TUI main loop"""
         self.poll_thread.join()
+        os.close(self._poll_fd)
+        self.tracker.close()
         raise urwid.ExitMainLoop()
 
     def keypress(self, key: str):
@@ -122,7 +176,7 @@ class FrontEnd(object):
             self._switch_view()
 
     @staticmethod
-    def _initialize_gauge_card() -> urwid.LineBox:
+    def _initialize_gauge_card() -> Tuple[urwid.LineBox, GaugeCard]:
         """Method for initializing the visual GPU cards. Each card
         is represented with a LineBox-wrapped Pile widget. Within
         the Pile widget, several sub widgets are enumerated:
@@ -138,23 +192,28 @@ class FrontEnd(object):
             7: Padding(ProgressBar) -> Temperature fraction
             8: Padding(Text) -> Power string
             9: Padding(ProgressBar) -> Power fraction
+
+        Returns
+        -------
+        box:
+            GPU gauge card
+        refs:
+            GaugeCard references to the Text and ProgressBar
+            widgets of the card
         """
-        pile = []
-        pile.append(urwid.Text(""))
+        widgets = [urwid.Text("")]
+        pile = [widgets[0]]
         for _ in range(4):
-            pile.append(urwid.Padding(urwid.Text(""), left=2))
-            pile.append(
-                urwid.Padding(
-                    urwid.ProgressBar("rev", "rev_inc", current=0),
-                    width=("relative", 90),
-                    align="center",
-                )
-            )
+            text = urwid.Text("")
+            bar = urwid.ProgressBar("rev", "rev_inc", current=0)
+            widgets.extend((text, bar))
+            pile.append(urwid.Padding(text, left=2))
+            pile.append(urwid.Padding(bar, width=("relative", 90), align="center"))
         box = urwid.LineBox(urwid.Pile(pile))
-        return box
+        return box, GaugeCard(*widgets)
 
     @staticmethod
-    def _initialize_proc_card() -> urwid.LineBox:
+    def _initialize_proc_card() -> Tuple[urwid.LineBox, ProcCard]:
         """Method for initializing the process GPU cards. Each card
         is represented with a LineBox-wrapped Pile widget. Within
         the Pile widget, several sub widgets are enumerated:
@@ -162,47 +221,38 @@ class FrontEnd(object):
         LineBox:
           Pile:
             1: Text -> (GPU name)
-            2: Padding(Text) -> Process string
-        """
-
-        pile = []
-        pile.append(urwid.Text(""))
-        pile.append(urwid.Padding(urwid.Text(""), left=2))
-        box = urwid.LineBox(urwid.Pile(pile))
-        return box
-
-    def _update_proc_pile(self, name_str: str, proc_strs: List[str]) -> urwid.LineBox:
-        """Method for updating/filling out a process card
-
-        Parameters
-        ----------
-        name_str:
-            GPU name
-        proc_strs:
-            List of process information strings
+            2: Padding(Text) -> Process strings, one per line
 
         Returns
         -------
         box:
             GPU process card
+        refs:
+            ProcCard references to the Text widgets of the card
         """
+
+        refs = ProcCard(name_text=urwid.Text(""), proc_text=urwid.Text(""))
         pile = []
-        pile.append(urwid.Text(name_str))
-        for p in enumerate(proc_strs):
-            pile.append(urwid.Padding(urwid.Text(p), left=2))
+        pile.append(refs.name_text)
+        pile.append(urwid.Padding(refs.proc_text, left=2))
         box = urwid.LineBox(urwid.Pile(pile))
-        return box
+        return box, refs
 
     def _initialize_grid(self):
         """Method for initializing the GPU card grid using urwid.GridFlow"""
+        # New cards are blank, so nothing drawn so far can be reused
+        self._last_strings = {}
+        self._last_displayed = None
         if self.current_view == "overwatch":
-            card_list = [
+            cards = [
                 FrontEnd._initialize_gauge_card() for _ in range(self.tracker.num_gpus)
             ]
         if self.current_view == "process":
-            card_list = [
+            cards = [
                 FrontEnd._initialize_proc_card() for _ in range(self.tracker.num_gpus)
             ]
+        card_list = [box for box, _ in cards]
+        self.card_refs = [refs for _, refs in cards]
         self.grid = urwid.GridFlow(
             card_list,
             self.card_width,
@@ -231,135 +281,147 @@ class FrontEnd(object):
         Parameters
         ----------
         val:
-            input value that should range from 0 to 100
+            input value that should range from 0 to 100. Values
+            outside of this range are clamped.
 
         Returns
         -------
         color:
             urwid palette key
         """
-        if val < 33:
-            color = "low"
-        elif val > 33 and val < 66:
-            color = "medium"
-        else:
-            color = "high"
-        return color
+        return FrontEnd._color_lut[min(100, max(0, val))]
+
+    def _on_poll(self, data: bytes) -> bool:
+        """Pipe callback, run in the main loop once one or more
+        polls have completed since the last call
+
+        Parameters
+        ----------
+        data:
+            Bytes written by the polling thread, one per poll
+
+        Returns
+        -------
+        keep_watching:
+            False once the pipe is closed, which removes the watch
+        """
+        if not data:
+            return False
+        self._draw()
+        return True
 
     def _draw(self, *args):
         """Depending on the current view, runs drawing routines"""
+        # Read the buffer reference once; a poll may publish a new one mid-draw
+        all_gpu_props = self.tracker.props_buffer
+        if all_gpu_props == None:
+            return None
         if self.current_view == "overwatch":
-            self._draw_overwatch()
+            # Every displayed property, ie all but the processes, taken
+            # from the same snapshot that is drawn
+            displayed = tuple(
+                (gpu_id, props[:-1]) for gpu_id, props in all_gpu_props.items()
+            )
+            # Only redraw if something shown in this view changed
+            if displayed != self._last_displayed:
+                self._last_displayed = displayed
+                self._draw_overwatch(all_gpu_props)
         if self.current_view == "process":
-            self._draw_process()
-        self.loop.set_alarm_in(1, self._draw)
+            self._draw_process(all_gpu_props)
 
-    def _draw_process(self):
-        """Method for drawing process information to each GPU window"""
-        all_gpu_props = self.tracker.props_buffer
-        if all_gpu_props != None:
-            gpu_ids = sorted(all_gpu_props.keys())
-            card_list = []
-            for gpu_id in gpu_ids:
-                name_string = "{}: {} ({}%)".format(
-                    gpu_id,
-                    all_gpu_props[gpu_id]["name"],
-                    all_gpu_props[gpu_id]["utilization"],
-                )
-                processes = all_gpu_props[gpu_id]["processes"].keys()
-                proc_strs = []
-                for i, process in enumerate(processes):
-                    proc = all_gpu_props[gpu_id]["processes"][process]
-                    proc_string = "{}: {} {} {} {}".format(
-                        proc["user"],
-                        process,
-                        proc["name"],
-                        proc["lifetime"],
-                        proc["mem"],
-                    )
-                    proc_strs.append(proc_string)
-                card_list.append(self._update_proc_pile(name_string, proc_strs))
-            self.grid = urwid.GridFlow(
-                card_list,
-                self.card_width,
-                FrontEnd.box_padding,
-                FrontEnd.box_padding,
-                "center",
-            )
-            self.top.contents["body"][0].original_widget = self.grid
+    def _draw_process(self, all_gpu_props: Dict[int, GPUProps]):
+        """Method for drawing process information to each GPU window.
+        The existing card widgets are updated in place.
 
-    def _draw_overwatch(self, *args):
-        """Method for drawing stats information to each GPU window"""
-        all_gpu_props = self.tracker.props_buffer
-        if all_gpu_props != None:
-            gpu_ids = sorted(all_gpu_props.keys())
-            for gpu_id in gpu_ids:
-                name_string = "{}: {} ({}%)".format(
-                    gpu_id,
-                    all_gpu_props[gpu_id]["name"],
-                    all_gpu_props[gpu_id]["utilization"],
-                )
-                mem_string = "{}{}/{} MiB".format(
-                    FrontEnd.overwatch_labels["memory"],
-                    all_gpu_props[gpu_id]["used_mem"],
-                    all_gpu_props[gpu_id]["total_mem"],
-                )
-                fan_string = "{}{} %".format(
-                    FrontEnd.overwatch_labels["fan"], int(all_gpu_props[gpu_id]["fan"])
-                )
-                temp_string = "{}{}/{} C".format(
-                    FrontEnd.overwatch_labels["temperature"],
-                    int(all_gpu_props[gpu_id]["temp"]),
-                    int(all_gpu_props[gpu_id]["max_temp"]),
-                )
-                power_string = "{}{}/{} W".format(
-                    FrontEnd.overwatch_labels["power"],
-                    int(all_gpu_props[gpu_id]["used_power"]),
-                    int(all_gpu_props[gpu_id]["power_limit"]),
+        Parameters
+        ----------
+        all_gpu_props:
+            Snapshot of Tracker.props_buffer to draw
+        """
+        gpu_ids = sorted(all_gpu_props.keys())
+        for gpu_id in gpu_ids:
+            props = all_gpu_props[gpu_id]
+            name_string = "{}: {} ({}%)".format(gpu_id, props.name, props.utilization)
+            proc_strs = [
+                "{}: {} {} {} {}".format(
+                    proc.user, pid, proc.name, proc.lifetime, proc.mem
                 )
+                for pid, proc in props.processes.items()
+            ]
 
-                mem_frac = int(
-                    100
-                    * (
-                        all_gpu_props[gpu_id]["used_mem"]
-                        / all_gpu_props[gpu_id]["total_mem"]
-                    )
-                )
-                power_frac = int(
-                    100
-                    * (
-                        all_gpu_props[gpu_id]["used_power"]
-                        / all_gpu_props[gpu_id]["power_limit"]
-                    )
-                )
-                temp_frac = int(
-                    100
-                    * (
-                        all_gpu_props[gpu_id]["temp"]
-                        / all_gpu_props[gpu_id]["max_temp"]
-                    )
-                )
-                fan_frac = all_gpu_props[gpu_id]["fan"]
+            refs = self.card_refs[gpu_id]
+            refs.name_text.set_text(name_string)
+            refs.proc_text.set_text("\n".join(proc_strs))
 
-                card_contents = (
-                    self.top.contents["body"][0]
-                    .original_widget.contents[gpu_id][0]
-                    .original_widget.contents
-                )
-                card_contents[0][0].set_text(name_string)
-                card_contents[1][0].original_widget.set_text(
-                    (self._determine_color(mem_frac), mem_string)
-                )
-                card_contents[2][0].original_widget.set_completion(mem_frac)
-                card_contents[3][0].original_widget.set_text(
-                    (self._determine_color(fan_frac), fan_string)
-                )
-                card_contents[4][0].original_widget.set_completion(fan_frac)
-                card_contents[5][0].original_widget.set_text(
-                    (self._determine_color(temp_frac), temp_string)
-                )
-                card_contents[6][0].original_widget.set_completion(temp_frac)
-                card_contents[7][0].original_widget.set_text(
+    def _draw_overwatch(self, all_gpu_props: Dict[int, GPUProps]):
+        """Method for drawing stats information to each GPU window. Only
+        the widgets of stats whose displayed string changed since the last
+        draw are updated, so urwid has nothing to re-render for the rest.
+        Each string fully determines its fraction and color.
+
+        Parameters
+        ----------
+        all_gpu_props:
+            Snapshot of Tracker.props_buffer to draw
+        """
+        mem_fmt = FrontEnd._mem_fmt
+        fan_fmt = FrontEnd._fan_fmt
+        temp_fmt = FrontEnd._temp_fmt
+        power_fmt = FrontEnd._power_fmt
+        gpu_ids = sorted(all_gpu_props.keys())
+        for gpu_id in gpu_ids:
+            props = all_gpu_props[gpu_id]
+            used_mem = props.used_mem
+            total_mem = props.total_mem
+            fan = props.fan
+            temp = props.temp
+            max_temp = props.max_temp
+            used_power = props.used_power
+            power_limit = props.power_limit
+
+            name_string = "%d: %s (%d%%)" % (
+                gpu_id,
+                props.name,
+                props.utilization,
+            )
+            mem_string = mem_fmt % (used_mem, total_mem)
+            fan_string = fan_fmt % fan
+            temp_string = temp_fmt % (temp, max_temp)
+            power_string = power_fmt % (used_power, power_limit)
+
+            strings = (
+                name_string,
+                mem_string,
+                fan_string,
+                temp_string,
+                power_string,
+            )
+            last_strings = self._last_strings.get(gpu_id)
+            if last_strings == strings:
+                continue
+            if last_strings is None:
+                last_strings = (None,) * len(strings)
+            self._last_strings[gpu_id] = strings
+
+            # Fractions are only computed for changed stats. Unavailable
+            # limits are reported as zero.
+            refs = self.card_refs[gpu_id]
+            if name_string != last_strings[0]:
+                refs.name_text.set_text(name_string)
+            if mem_string != last_strings[1]:
+                mem_frac = used_mem * 100 // total_mem if total_mem else 0
+                refs.mem_text.set_text((self._determine_color(mem_frac), mem_string))
+                refs.mem_bar.set_completion(mem_frac)
+            if fan_string != last_strings[2]:
+                refs.fan_text.set_text((self._determine_color(fan), fan_string))
+                refs.fan_bar.set_completion(fan)
+            if temp_string != last_strings[3]:
+                temp_frac = temp * 100 // max_temp if max_temp else 0
+                refs.temp_text.set_text((self._determine_color(temp_frac), temp_string))
+                refs.temp_bar.set_completion(temp_frac)
+            if power_string != last_strings[4]:
+                power_frac = used_power * 100 // power_limit if power_limit else 0
+                refs.power_text.set_text(
                     (self._determine_color(power_frac), power_string)
                 )
-                card_contents[8][0].original_widget.set_completion(power_frac)
+                refs.power_bar.set_completion(power_frac)
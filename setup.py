@@ -25,6 +25,7 @@ setup(
     license="MIT",
     packages=find_packages(),
     install_requires=install_requires,
+    extras_require={"nvml": ["nvidia-ml-py"]},
     zip_safe=True,
     cmdclass={"install": InstallScript},
     entry_points={